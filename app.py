@@ -2,8 +2,9 @@ from flask import Flask, request, jsonify
 import os
 import json
 import requests
-from datetime import datetime
+from datetime import datetime, date
 import gspread
+from gspread.utils import numericise_all, rowcol_to_a1
 from google.oauth2.service_account import Credentials
 from google.oauth2 import service_account
 
@@ -35,89 +36,20 @@ def resolve_conflicts(notion_item, sheet_row):
     
     return "notion"  # Varsayılan olarak Notion'ı tercih et
 
-def get_notion_data(filter_recent=False):
-    """Notion veritabanından veri çeker, opsiyonel olarak son değişiklikleri filtreler"""
-    url = f"https://api.notion.com/v1/databases/{NOTION_DATABASE_ID}/query"
-    
-    payload = {}
-    if filter_recent:
-        # Son 24 saatte değişmiş kayıtları al
-        last_sync = get_last_sync_time()
-        if last_sync:
-            payload["filter"] = {
-                "property": "last_edited_time",
-                "date": {
-                    "on_or_after": last_sync
-                }
-            }
-    
-    response = requests.post(url, headers=NOTION_HEADERS, json=payload)
-    
-    if response.status_code != 200:
-        raise Exception(f"Notion API hatası: {response.status_code} - {response.text}")
-    
-    data = response.json()
-    results = []
-    
-    for item in data.get('results', []):
-        row_data = {}
-        properties = item.get('properties', {})
-        
-        # Farklı veri tiplerini işle
-        for prop_name, prop_data in properties.items():
-            prop_type = prop_data.get('type', '')
-            
-            if prop_type == 'title':
-                title_array = prop_data.get('title', [])
-                row_data[prop_name] = title_array[0].get('plain_text', '') if title_array else ''
-            elif prop_type == 'rich_text':
-                text_array = prop_data.get('rich_text', [])
-                row_data[prop_name] = text_array[0].get('plain_text', '') if text_array else ''
-            elif prop_type == 'number':
-                row_data[prop_name] = prop_data.get('number', 0)
-            elif prop_type == 'select':
-                select_data = prop_data.get('select', {})
-                row_data[prop_name] = select_data.get('name', '') if select_data else ''
-            elif prop_type == 'multi_select':
-                multi_select = prop_data.get('multi_select', [])
-                names = [item.get('name', '') for item in multi_select if item]
-                row_data[prop_name] = ', '.join(names)
-            elif prop_type == 'date':
-                date_data = prop_data.get('date', {})
-                row_data[prop_name] = date_data.get('start', '') if date_data else ''
-            elif prop_type == 'checkbox':
-                row_data[prop_name] = prop_data.get('checkbox', False)
-            else:
-                row_data[prop_name] = f"[{prop_type}]"
-        
-        # Kimlik ve düzenleme zamanı ekle
-        row_data['notion_id'] = item.get('id', '')
-        row_data['last_edited_time'] = item.get('last_edited_time', '')
-        
-        results.append(row_data)
-    
-    return results
-
-def delete_from_sheets(notion_id):
-    """Sheets'ten bir kaydı siler"""
+def delete_from_sheets(notion_id, sheet_ops=None):
+    """Sheets'ten bir kaydı siler (sheet_ops verilirse silme işlemi sıraya alınır)"""
     try:
-        client = get_sheets_client()
-        sheet = client.open(GOOGLE_SHEET_NAME).sheet1
-        
-        # Tüm kayıtları al
-        records = sheet.get_all_records()
+        ops = sheet_ops or open_sheet_operations()
         
-        # Silinecek kaydın satır numarasını bul
-        row_num = None
-        for idx, record in enumerate(records):
-            if record.get('notion_id') == notion_id:
-                row_num = idx + 2  # +2: başlık satırı ve 0-indeksli olduğu için
-                break
+        # Silinecek kaydın satırını bul
+        row_idx = ops.find_row(notion_id)
         
         # Eğer kayıt bulunduysa sil
-        if row_num:
-            sheet.delete_row(row_num)
-            print(f"Sheets'ten silindi: {notion_id} (Satır: {row_num})")
+        if row_idx is not None:
+            ops.delete_row(row_idx)
+            if sheet_ops is None:
+                ops.commit()
+            print(f"Sheets'ten silindi: {notion_id} (Satır: {row_idx + 2})")
             return True
         
         return False
@@ -145,34 +77,33 @@ def delete_from_notion(notion_id):
         print(f"Notion'dan silme hatası: {str(e)}")
         return False
 
-def handle_deleted_records():
+def handle_deleted_records(sheet_ops=None):
     """Bir sistemde silinen kayıtları diğer sistemde de siler"""
     try:
-        # Notion'daki tüm kayıtları al
-        notion_data = get_notion_data()
-        notion_ids = {item.get('notion_id', '') for item in notion_data if item.get('notion_id', '')}
+        # Notion'daki tüm kayıtları al - sadece kapsam kontrolü için gereken özellikler istenir
+        notion_data = get_notion_data(properties=SCOPE_PROPERTIES)
+        
+        # Sheets kuyruğunu Notion okumasından sonra aç (okuma ile yazma arası kısa kalsın)
+        ops = sheet_ops or open_sheet_operations()
         
         # Sheets'teki tüm kayıtları al
-        sheets_data = get_sheets_data()
-        sheets_notion_ids = {row.get('notion_id', '') for row in sheets_data if row.get('notion_id', '')}
+        sheets_data = get_sheets_data(ops)
+        deleted_from_notion, deleted_from_sheets = plan_deleted_records(notion_data, sheets_data, get_sync_scope())
         
-        # Notion'da olmayan ama Sheets'te olan kayıtları bul (Notion'dan silinmiş)
-        deleted_from_notion = sheets_notion_ids - notion_ids
+        # Notion'dan silinmiş kayıtları Sheets'ten sil
         notion_deleted_count = 0
         for notion_id in deleted_from_notion:
-            if notion_id:  # Boş ID'leri atla
-                # Bu kaydı Sheets'ten sil
-                if delete_from_sheets(notion_id):
-                    notion_deleted_count += 1
+            if delete_from_sheets(notion_id, ops):
+                notion_deleted_count += 1
         
-        # Sheets'te olmayan ama Notion'da olan kayıtları bul (Sheets'ten silinmiş)
-        deleted_from_sheets = notion_ids - sheets_notion_ids
+        # Sheets'ten silinmiş kayıtları Notion'dan sil
         sheets_deleted_count = 0
         for notion_id in deleted_from_sheets:
-            if notion_id:  # Boş ID'leri atla
-                # Bu kaydı Notion'dan sil
-                if delete_from_notion(notion_id):
-                    sheets_deleted_count += 1
+            if delete_from_notion(notion_id):
+                sheets_deleted_count += 1
+        
+        if sheet_ops is None:
+            ops.commit()
         
         return {"notion": notion_deleted_count, "sheets": sheets_deleted_count}
     except Exception as e:
@@ -187,6 +118,21 @@ NOTION_DATABASE_ID = os.environ.get('NOTION_DATABASE_ID', '')
 GOOGLE_CREDENTIALS = os.environ.get('GOOGLE_CREDENTIALS', '{}')  # GOOGLE_CREDENTIALS_JSON yerine GOOGLE_CREDENTIALS 
 GOOGLE_SHEET_NAME = os.environ.get('GOOGLE_SHEET_NAME', '')
 
+# Senkronizasyon kapsamı - boş bırakılırsa tüm kayıtlar alınır
+SYNC_DATE_FROM = os.environ.get('SYNC_DATE_FROM', '')  # ör. "today" ya da "2024-01-01"
+SYNC_DATE_TO = os.environ.get('SYNC_DATE_TO', '')
+SYNC_STATUS = os.environ.get('SYNC_STATUS', '')  # virgülle ayrılmış Durum değerleri
+
+# Sheets'e aktarılan Notion özellikleri (filter_properties için)
+SYNC_PROPERTIES = ['Etkinlik Adı', 'Müşteri', 'Tarih', 'Yer', 'Durum',
+                   'Etkinlik Türü', 'Kişi Sayısı', 'NX Kodu']
+
+# Kapsam kontrolü için gereken Notion özellikleri (silme kontrolünde kullanılır)
+SCOPE_PROPERTIES = ['Etkinlik Adı', 'Tarih', 'Durum']
+
+# Notion özellik adı -> özellik ID önbelleği
+NOTION_PROPERTY_IDS = {}
+
 # Notion API headers
 NOTION_HEADERS = {
     "Authorization": f"Bearer {NOTION_TOKEN}",
@@ -208,16 +154,362 @@ def get_sheets_client():
         print(f"Sheets istemcisi oluşturulurken hata: {str(e)}")
         raise Exception(f"Sheets istemcisi hatası: {str(e)}")
 
-def get_notion_data():
-    """Notion veritabanından veri çeker"""
+class SheetOperations:
+    """Bir senkronizasyon boyunca Sheets değişikliklerini bellekte toplar.
+    
+    Sayfa bir kez okunur, tüm yazma/silme işlemleri bellekteki kopyaya uygulanır ve
+    commit() ile sadece net değişen hücreler tek bir toplu istekle yazılır. Aynı
+    hücreye yapılan ardışık yazmalar birleşir, sonradan silinen satırlara yapılan
+    yazmalar hiç gönderilmez.
+    """
+    
+    def __init__(self, sheet):
+        self.sheet = sheet
+        values = sheet.get_all_values()
+        self.headers = list(values[0]) if values else []
+        self.row_count = sheet.row_count
+        self.original_headers = list(self.headers)
+        # Her satır orijinal konumunu (yeni satırlarda None) ve değerlerini tutar
+        self.rows = [{'origin': idx, 'values': list(row)} for idx, row in enumerate(values[1:])]
+        self.original_rows = [list(row) for row in values[1:]]
+        self.deleted = set()
+    
+    def _pad(self, values):
+        return list(values) + [''] * (len(self.headers) - len(values))
+    
+    def set_headers(self, headers):
+        """Başlık satırını ayarlar (boş sayfa için)"""
+        self.headers = list(headers)
+    
+    def get_all_records(self):
+        """Bellekteki güncel durumu get_all_records() ile aynı biçimde döndürür"""
+        return [dict(zip(self.headers, numericise_all(self._pad(row['values']))))
+                for row in self.rows]
+    
+    def find_row(self, notion_id):
+        """notion_id'ye göre satır indeksini (0 tabanlı, başlık hariç) bulur"""
+        for idx, row in enumerate(self.rows):
+            if dict(zip(self.headers, row['values'])).get('notion_id') == notion_id:
+                return idx
+        return None
+    
+    def update_cell(self, idx, header, value):
+        """Bir satırdaki tek hücreyi günceller"""
+        if header not in self.headers:
+            return
+        row = self.rows[idx]
+        row['values'] = self._pad(row['values'])
+        row['values'][self.headers.index(header)] = str(value)
+    
+    def update_row(self, idx, values):
+        """Bir satırı başlıklara göre sözlükten günceller"""
+        self.rows[idx]['values'] = [str(values.get(header, '')) for header in self.headers]
+    
+    def append_row(self, values):
+        """Sayfanın sonuna yeni satır ekler"""
+        self.rows.append({'origin': None, 'values': [str(values.get(header, '')) for header in self.headers]})
+    
+    def delete_row(self, idx):
+        """Bir satırı siler"""
+        row = self.rows.pop(idx)
+        if row['origin'] is not None:
+            self.deleted.add(row['origin'])
+    
+    def sort_rows(self, header):
+        """Satırları verilen sütuna göre (büyük/küçük harf duyarsız) sıralar"""
+        if header not in self.headers:
+            return
+        col = self.headers.index(header)
+        self.rows.sort(key=lambda row: self._pad(row['values'])[col].lower())
+    
+    def _notion_ids(self, rows):
+        if 'notion_id' not in self.original_headers:
+            return [''] * len(rows)
+        col = self.original_headers.index('notion_id')
+        return [row[col] if col < len(row) else '' for row in rows]
+    
+    def _locate(self, fresh_rows, origin):
+        """Okumadaki bir satırın sayfadaki güncel konumunu bulur (bulunamazsa None)"""
+        width = max([len(self.original_headers)] + [len(row) for row in fresh_rows])
+        pad = lambda row: list(row) + [''] * (width - len(row))
+        expected = pad(self.original_rows[origin])
+        
+        if origin < len(fresh_rows) and pad(fresh_rows[origin]) == expected:
+            return origin
+        matches = [idx for idx, row in enumerate(fresh_rows) if pad(row) == expected]
+        return matches[0] if len(matches) == 1 else None
+    
+    def write_now(self, idx, values):
+        """Bir satırdaki hücreleri sıraya almadan hemen yazar.
+        
+        Notion'da oluşturulan sayfaların notion_id'si gibi, commit() yapılamasa bile
+        kaybolmaması gereken değerler için kullanılır.
+        """
+        for header, value in values.items():
+            self.update_cell(idx, header, value)
+        
+        origin = self.rows[idx]['origin']
+        if origin is None:
+            # Henüz sayfada olmayan satır commit() ile yazılır
+            return
+        
+        fresh = self.sheet.get_all_values()
+        position = self._locate(fresh[1:], origin)
+        if position is None or not fresh or list(fresh[0]) != self.original_headers:
+            print(f"Satır Sheets'te bulunamadı, değerler commit ile yazılacak (satır: {origin + 2})")
+            return
+        
+        data = []
+        original = list(self.original_rows[origin])
+        for header, value in values.items():
+            if header not in self.original_headers:
+                continue
+            col = self.original_headers.index(header)
+            data.append({"range": rowcol_to_a1(position + 2, col + 1), "values": [[str(value)]]})
+            # Okumadaki kopyayı da güncelle ki commit bu hücreyi tekrar yazmasın
+            original += [''] * (col + 1 - len(original))
+            original[col] = str(value)
+        
+        if data:
+            self.sheet.batch_update(data)
+        self.original_rows[origin] = original
+    
+    def _check_layout(self):
+        """Okumadan bu yana sayfanın satır düzeni değiştiyse hata verir.
+        
+        Silme ve yazma işlemleri satır konumuna göre yapıldığı için okunan satırlar
+        aynı sırada yerinde durmalıdır; sona eklenen satırlara izin verilir ve
+        bunlar döndürülür.
+        """
+        values = self.sheet.get_all_values()
+        headers = list(values[0]) if values else []
+        rows = values[1:]
+        known = len(self.original_rows)
+        
+        if (headers != self.original_headers or len(rows) < known
+                or self._notion_ids(rows[:known]) != self._notion_ids(self.original_rows)):
+            raise Exception("Sheets sayfası senkronizasyon sırasında değişti, değişiklikler yazılmadı")
+        
+        return [list(row) for row in rows[known:]]
+    
+    def _diff(self, target, current):
+        """İki tablo arasında değişen hücreleri bitişik A1 aralıkları halinde döndürür"""
+        width = max([0] + [len(row) for row in target + current])
+        
+        data = []
+        cell_count = 0
+        for row_num, target_row in enumerate(target, start=1):
+            target_row = list(target_row) + [''] * (width - len(target_row))
+            current_row = current[row_num - 1] if row_num <= len(current) else []
+            current_row = list(current_row) + [''] * (width - len(current_row))
+            
+            col = 0
+            while col < width:
+                if target_row[col] == current_row[col]:
+                    col += 1
+                    continue
+                start = col
+                while col < width and target_row[col] != current_row[col]:
+                    col += 1
+                data.append({
+                    "range": f"{rowcol_to_a1(row_num, start + 1)}:{rowcol_to_a1(row_num, col)}",
+                    "values": [target_row[start:col]]
+                })
+                cell_count += col - start
+        
+        return data, cell_count
+    
+    def commit(self):
+        """Net değişiklikleri Sheets'e yazar, yazılan hücre sayısını döndürür"""
+        target_rows = [row['values'] for row in self.rows]
+        kept_rows = [row for origin, row in enumerate(self.original_rows) if origin not in self.deleted]
+        
+        # 1. Değişiklik yoksa sayfaya hiç dokunma
+        data, _ = self._diff([self.headers] + target_rows, [self.original_headers] + kept_rows)
+        if not data and not self.deleted:
+            return 0
+        
+        # 2. Konuma göre yazmadan önce okunan satırların yerinde durduğundan emin ol;
+        # bu arada sona eklenen satırlar korunur ve bizim satırlarımızdan sonra gelir
+        extra_rows = self._check_layout()
+        current = [self.original_headers] + kept_rows + extra_rows
+        target = [self.headers] + target_rows + extra_rows
+        data, cell_count = self._diff(target, current)
+        
+        # 3. Yapısal değişiklikler: silinen satırlar (alttan üste) ve gerekirse yeni satırlar
+        requests_body = []
+        for origin in sorted(self.deleted, reverse=True):
+            requests_body.append({"deleteDimension": {"range": {
+                "sheetId": self.sheet.id, "dimension": "ROWS",
+                "startIndex": origin + 1, "endIndex": origin + 2
+            }}})
+        
+        row_count = max(self.row_count, len(self.original_rows) + len(extra_rows) + 1) - len(self.deleted)
+        needed_rows = len(target)
+        if needed_rows > row_count:
+            requests_body.append({"appendDimension": {
+                "sheetId": self.sheet.id, "dimension": "ROWS", "length": needed_rows - row_count
+            }})
+        
+        if requests_body:
+            self.sheet.spreadsheet.batch_update({"requests": requests_body})
+        
+        # 4. Değişen hücreleri tek istekle yaz
+        if data:
+            self.sheet.batch_update(data)
+        
+        print(f"Sheets'e yazıldı: {cell_count} hücre, {len(self.deleted)} satır silindi")
+        
+        # Yazılan durumu yeni başlangıç noktası yap
+        self.row_count = max(row_count, needed_rows)
+        self.original_headers = list(self.headers)
+        self.original_rows = [list(row) for row in target[1:]]
+        self.rows = [{'origin': idx, 'values': list(row)} for idx, row in enumerate(self.original_rows)]
+        self.deleted = set()
+        
+        return cell_count
+
+def open_sheet_operations():
+    """Çalışma sayfasını açar ve değişiklikleri toplayacak bir SheetOperations döndürür"""
+    client = get_sheets_client()
+    sheet = client.open(GOOGLE_SHEET_NAME).sheet1
+    return SheetOperations(sheet)
+
+def commit_after_error(sheet_ops):
+    """Hata sonrası o ana kadar sıraya alınan değişiklikleri yazar.
+    
+    Yazma hatası asıl hatayı gizlemesin diye sadece loglanır.
+    """
+    if sheet_ops is None:
+        return
+    try:
+        sheet_ops.commit()
+    except Exception as e:
+        print(f"Sheets değişiklikleri yazılamadı: {str(e)}")
+
+def get_sync_scope():
+    """Çevre değişkenlerinden senkronizasyon kapsamını (tarih aralığı ve durum) okur"""
+    today = date.today().isoformat()
+    date_from = SYNC_DATE_FROM.strip()
+    date_to = SYNC_DATE_TO.strip()
+    
+    return {
+        "date_from": today if date_from.lower() == 'today' else date_from,
+        "date_to": today if date_to.lower() == 'today' else date_to,
+        "status": [s.strip() for s in SYNC_STATUS.split(',') if s.strip()]
+    }
+
+def build_notion_filter(scope=None, filter_recent=False):
+    """Kapsam ve son senkronizasyon zamanından Notion sorgu filtresi oluşturur"""
+    conditions = []
+    
+    if filter_recent:
+        # Son senkronizasyondan sonra değişmiş kayıtlar
+        last_sync = get_last_sync_time()
+        if last_sync:
+            conditions.append({
+                "timestamp": "last_edited_time",
+                "last_edited_time": {"on_or_after": last_sync}
+            })
+    
+    if scope:
+        # Tarih aralığı (ör. sadece yaklaşan etkinlikler)
+        if scope.get('date_from'):
+            conditions.append({"property": "Tarih", "date": {"on_or_after": scope['date_from']}})
+        if scope.get('date_to'):
+            conditions.append({"property": "Tarih", "date": {"on_or_before": scope['date_to']}})
+        
+        # Durum filtresi - birden fazla değer "or" ile birleştirilir
+        statuses = scope.get('status', [])
+        if len(statuses) == 1:
+            conditions.append({"property": "Durum", "select": {"equals": statuses[0]}})
+        elif statuses:
+            conditions.append({"or": [{"property": "Durum", "select": {"equals": s}} for s in statuses]})
+    
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"and": conditions}
+
+def in_sync_scope(item, scope):
+    """Bir Notion kaydının senkronizasyon kapsamında olup olmadığını yerel olarak kontrol eder"""
+    # Notion tarih filtreleri boş tarihli kayıtları dışarıda bırakır
+    item_date = str(item.get('Tarih', '') or '')[:10]
+    if scope.get('date_from') and (not item_date or item_date < scope['date_from'][:10]):
+        return False
+    if scope.get('date_to') and (not item_date or item_date > scope['date_to'][:10]):
+        return False
+    
+    statuses = scope.get('status', [])
+    if statuses and item.get('Durum', '') not in statuses:
+        return False
+    
+    return True
+
+def get_notion_property_ids(names):
+    """Notion özellik adlarını özellik ID'lerine çevirir (veritabanı şeması önbelleğe alınır)"""
+    if not NOTION_PROPERTY_IDS:
+        url = f"https://api.notion.com/v1/databases/{NOTION_DATABASE_ID}"
+        response = requests.get(url, headers=NOTION_HEADERS)
+        
+        if response.status_code != 200:
+            raise Exception(f"Notion şema hatası: {response.status_code} - {response.text}")
+        
+        store_notion_property_ids(response.json())
+    
+    return lookup_notion_property_ids(names)
+
+def store_notion_property_ids(schema):
+    """Veritabanı şemasındaki özellik ID'lerini önbelleğe alır"""
+    for prop_name, prop_data in schema.get('properties', {}).items():
+        NOTION_PROPERTY_IDS[prop_name] = prop_data.get('id', '')
+
+def lookup_notion_property_ids(names):
+    """Önbellekteki özellik ID'lerini adlara göre döndürür"""
+    return [NOTION_PROPERTY_IDS[name] for name in names if NOTION_PROPERTY_IDS.get(name)]
+
+def build_notion_query(filter_recent=False, scope=None, property_ids=None):
+    """Notion sorgusu için URL ve istek gövdesini oluşturur"""
     url = f"https://api.notion.com/v1/databases/{NOTION_DATABASE_ID}/query"
     
-    response = requests.post(url, headers=NOTION_HEADERS)
+    if property_ids:
+        # Özellik ID'leri Notion'dan URL-kodlu gelir, tekrar kodlanmaması için elle ekle
+        url += "?" + "&".join(f"filter_properties={pid}" for pid in property_ids)
     
-    if response.status_code != 200:
-        raise Exception(f"Notion API hatası: {response.status_code} - {response.text}")
+    payload = {"page_size": 100}
+    query_filter = build_notion_filter(scope, filter_recent)
+    if query_filter:
+        payload["filter"] = query_filter
     
-    data = response.json()
+    return url, payload
+
+def get_notion_data(filter_recent=False, scope=None, properties=None):
+    """Notion veritabanından veri çeker.
+    
+    scope verilirse filtreleme Notion tarafında yapılır, properties verilirse
+    sadece bu özellikler döndürülür (filter_properties).
+    """
+    property_ids = get_notion_property_ids(properties) if properties else []
+    url, payload = build_notion_query(filter_recent, scope, property_ids)
+    
+    # Notion her istekte en fazla 100 kayıt döndürür, tüm sayfaları dolaş
+    results = []
+    while True:
+        response = requests.post(url, headers=NOTION_HEADERS, json=payload)
+        
+        if response.status_code != 200:
+            raise Exception(f"Notion API hatası: {response.status_code} - {response.text}")
+        
+        data = response.json()
+        results.extend(parse_notion_results(data))
+        
+        if not data.get('has_more') or not data.get('next_cursor'):
+            return results
+        payload["start_cursor"] = data['next_cursor']
+
+def parse_notion_results(data):
+    """Notion sorgu yanıtındaki sayfaları düz satır sözlüklerine çevirir"""
     results = []
     
     for item in data.get('results', []):
@@ -259,29 +551,27 @@ def get_notion_data():
     
     return results
 
-def update_google_sheet(data):
+def update_google_sheet(data, sheet_ops=None):
     """Google Sheets'e veri yazar, sadece değişen kayıtları günceller"""
     try:
-        client = get_sheets_client()
-        
-        # Çalışma sayfasını aç
-        sheet = client.open(GOOGLE_SHEET_NAME).sheet1
+        # Çalışma sayfasını aç (sheet_ops verilirse değişiklikler sıraya alınır)
+        ops = sheet_ops or open_sheet_operations()
         
         try:
             # Mevcut verileri al
-            existing_data = sheet.get_all_records()
+            existing_data = ops.get_all_records()
             
             # Mevcut kayıtları notion_id'ye göre mapla
-            existing_map = {row.get('notion_id', ''): (idx + 2, row) for idx, row in enumerate(existing_data)}
+            existing_map = {row.get('notion_id', ''): (idx, row) for idx, row in enumerate(existing_data)}
             
             # Başlıklar zaten varsa kullan, yoksa oluştur
-            if existing_data:
-                headers = sheet.row_values(1)
+            if ops.headers:
+                headers = ops.headers
             else:
                 # Takvim için gerekli alanları seç
                 headers = ['Etkinlik Adı', 'Müşteri', 'Tarih', 'Yer', 'Durum',
                              'Etkinlik Türü', 'Kişi Sayısı', 'notion_id', 'last_edited_time']
-                sheet.append_row(headers)
+                ops.set_headers(headers)
             
             # Yeni veya değiştirilmiş kayıtları güncelle
             updated_count = 0
@@ -311,32 +601,18 @@ def update_google_sheet(data):
                     # Notion'daki değişiklik Sheets'teki son güncellemeden sonraysa güncelle
                     if row.get('last_edited_time', '') > existing_row.get('last_edited_time', ''):
                         # Satırı güncelle
-                        cell_list = []
-                        for col_idx, header in enumerate(headers, start=1):
-                            cell_list.append(gspread.Cell(idx, col_idx, str(filtered_row.get(header, ''))))
-                        
-                        sheet.update_cells(cell_list)
+                        ops.update_row(idx, filtered_row)
                         updated_count += 1
                 else:
                     # Yeni kayıt - sona ekle
-                    values = [str(filtered_row.get(header, '')) for header in headers]
-                    sheet.append_row(values)
+                    ops.append_row(filtered_row)
                     new_count += 1
             
-             # Sıralama - Etkinlik Adı'na göre sırala
-            if existing_data or new_count > 0:
-                # Başlık satırını hariç tut ve verileri sırala
-                all_data = sheet.get_all_records()
-                
-                # Etkinlik Adı sütununa göre sırala (varsa)
-                if 'Etkinlik Adı' in headers:
-                    sorted_data = sorted(all_data, key=lambda x: x.get('Etkinlik Adı', '').lower(), reverse=False)
-                    
-                    # Sıralanmış verileri geri yaz
-                    sheet.update('A2', [
-                        [str(row.get(header, '')) for header in headers] 
-                        for row in sorted_data
-                    ])
+            # Sıralama - Etkinlik Adı'na göre sırala (sadece yeri değişen satırlar yazılır)
+            ops.sort_rows('Etkinlik Adı')
+            
+            if sheet_ops is None:
+                ops.commit()
             
             return {"updated": updated_count, "new": new_count, "total": len(data)}
             
@@ -369,7 +645,7 @@ def webhook():
     
     try:
         # Veritabanı değişikliği webhook'u
-        notion_data = get_notion_data()
+        notion_data = get_notion_data(scope=get_sync_scope(), properties=SYNC_PROPERTIES)
         print(f"{len(notion_data)} Notion kaydı bulundu")
         
         # Google Sheets'e gönder
@@ -390,7 +666,7 @@ def manual_sync():
         print("Sync endpoint çağrıldı.")
         
         # Notion'dan veri al
-        notion_data = get_notion_data()
+        notion_data = get_notion_data(scope=get_sync_scope(), properties=SYNC_PROPERTIES)
         print(f"Notion'dan {len(notion_data)} kayıt alındı.")
         
         # Google Sheets'e gönder
@@ -420,9 +696,12 @@ def test_notion():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 # Google Sheets'ten veri çekmek için yeni bir fonksiyon
-def get_sheets_data():
-    """Google Sheets'ten veri çeker"""
+def get_sheets_data(sheet_ops=None):
+    """Google Sheets'ten veri çeker (sheet_ops verilirse sıradaki değişikliklerle birlikte)"""
     try:
+        if sheet_ops is not None:
+            return sheet_ops.get_all_records()
+        
         client = get_sheets_client()
         sheet = client.open(GOOGLE_SHEET_NAME).sheet1
         
@@ -454,10 +733,7 @@ def create_notion_page(properties):
     """Notion'da yeni bir sayfa oluşturur"""
     url = "https://api.notion.com/v1/pages"
     
-    payload = {
-        "parent": {"database_id": NOTION_DATABASE_ID},
-        "properties": properties
-    }
+    payload = build_create_page_payload(properties)
     
     response = requests.post(url, headers=NOTION_HEADERS, json=payload)
     
@@ -466,97 +742,121 @@ def create_notion_page(properties):
     
     return response.json()
 
+def build_create_page_payload(properties):
+    """Veritabanında yeni sayfa oluşturmak için istek gövdesini hazırlar"""
+    return {
+        "parent": {"database_id": NOTION_DATABASE_ID},
+        "properties": properties
+    }
+
 # Google Sheets'ten Notion'a veri aktaran ana fonksiyon
-def update_notion_from_sheets():
+def update_notion_from_sheets(sheet_ops=None):
     """Google Sheets'ten Notion'a veri aktarır"""
+    ops = None
     try:
-        # Google Sheets'ten verileri al
-        sheets_data = get_sheets_data()
-        print(f"Google Sheets'ten {len(sheets_data)} kayıt alındı.")
-        
         # Notion'daki mevcut verileri al
-        notion_data = get_notion_data()
+        notion_data = get_notion_data(scope=get_sync_scope(), properties=SYNC_PROPERTIES)
         print(f"Notion'dan {len(notion_data)} kayıt alındı.")
         
-        # Notion verilerini ID'ye göre mapla
-        notion_map = {item.get('notion_id', ''): item for item in notion_data if item.get('notion_id', '')}
+        # Google Sheets değişikliklerini topla (yeni notion_id'leri geri aktarmak için)
+        ops = sheet_ops or open_sheet_operations()
+        
+        # Google Sheets'ten verileri al
+        sheets_data = get_sheets_data(ops)
+        print(f"Google Sheets'ten {len(sheets_data)} kayıt alındı.")
         
         # Güncelleme ve ekleme sayaçları
         updated_count = 0
         new_count = 0
         
-        # Google Sheets istemcisini hazırla (yeni notion_id'leri geri aktarmak için)
-        client = get_sheets_client()
-        sheet = client.open(GOOGLE_SHEET_NAME).sheet1
-        
-        # Başlıkları al
-        headers = sheet.row_values(1)
-        notion_id_col = headers.index('notion_id') + 1 if 'notion_id' in headers else None
+        # Her Google Sheets satırı için yapılacak işlemi uygula
+        for action, idx, notion_id, properties in plan_notion_changes(sheets_data, notion_data):
+            if action == 'update':
+                update_notion_page(notion_id, properties)
+                updated_count += 1
+                print(f"Kayıt güncellendi: {notion_id}")
+            else:
+                response = create_notion_page(properties)
+                new_count += 1
+                record_created_page(ops, idx, response.get('id', ''))
         
-        # Her Google Sheets satırı için
-        for idx, sheet_row in enumerate(sheets_data):
-            row_num = idx + 2  # Sheets'te satır numarası (başlık satırı + 1)
-            notion_id = sheet_row.get('notion_id', '')
-            
-            if notion_id and notion_id in notion_map:
-                # Mevcut Notion sayfası - değişiklik var mı kontrol et
-                notion_item = notion_map[notion_id]
-                
-                # Değişiklik kontrolü - her iki kaydı karşılaştır
-                has_changes = False
-                
-                # Önemli alanları kontrol et
-                for field in ['Etkinlik Adı', 'Müşteri', 'Tarih', 'Yer', 'Durum', 'Etkinlik Türü']:
-                    if field in sheet_row and field in notion_item:
-                        if str(sheet_row.get(field, '')) != str(notion_item.get(field, '')):
-                            has_changes = True
-                            print(f"Değişiklik tespit edildi - {field}: '{notion_item.get(field, '')}' -> '{sheet_row.get(field, '')}'")
-                            break
-                
-                # Son düzenleme zamanı kontrolü
-                sheet_last_edited = sheet_row.get('last_edited_time', '')
-                notion_last_edited = notion_item.get('last_edited_time', '')
-                time_based_update = not sheet_last_edited or not notion_last_edited or sheet_last_edited > notion_last_edited
-                
-                # Değişiklik varsa güncelle
-                if has_changes or time_based_update:
-                    # Notion API için properties nesnesi oluştur
-                    properties = build_notion_properties(sheet_row)
-                    
-                    # Notion sayfasını güncelle
-                    update_notion_page(notion_id, properties)
-                    updated_count += 1
-                    print(f"Kayıt güncellendi: {notion_id}")
-            elif not notion_id:
-                # Notion ID yoksa, bu yeni bir kayıt olabilir
-                # Kontrol: Bu satır Google Sheets'te oluşturulmuş yeni bir kayıt mı?
-                if 'Etkinlik Adı' in sheet_row and sheet_row['Etkinlik Adı']:
-                    # Etkinlik Adı alanı varsa, bu muhtemelen manuel olarak eklenmiş geçerli bir kayıt
-                    # Notion API için properties nesnesi oluştur
-                    properties = build_notion_properties(sheet_row)
-                    
-                    # Notion'da yeni sayfa oluştur
-                    response = create_notion_page(properties)
-                    new_notion_id = response.get('id', '')
-                    new_count += 1
-                    print(f"Yeni kayıt oluşturuldu: {new_notion_id}")
-                    
-                    # Yeni notion_id'yi Google Sheets'e geri aktar
-                    if notion_id_col and new_notion_id:
-                        sheet.update_cell(row_num, notion_id_col, new_notion_id)
-                        print(f"Yeni notion_id Google Sheets'e aktarıldı: {new_notion_id}")
-                        
-                        # last_edited_time sütunu varsa güncelle
-                        last_edited_col = headers.index('last_edited_time') + 1 if 'last_edited_time' in headers else None
-                        if last_edited_col:
-                            current_time = datetime.now().isoformat()
-                            sheet.update_cell(row_num, last_edited_col, current_time)
+        if sheet_ops is None:
+            ops.commit()
         
         return {"updated": updated_count, "new": new_count, "total": len(sheets_data)}
     except Exception as e:
+        # Hata olsa bile oluşturulan sayfaların notion_id'leri yazılmalı (tekrar oluşturulmasın)
+        if sheet_ops is None:
+            commit_after_error(ops)
         print(f"Notion güncelleme hatası: {str(e)}")
         raise Exception(f"Notion güncelleme hatası: {str(e)}")
+
+def plan_notion_changes(sheets_data, notion_data):
+    """Sheets satırlarından Notion'a yapılacak işlemleri belirler.
+    
+    (işlem, satır indeksi, notion_id, properties) listesi döndürür; işlem 'update' ya da 'create' olur.
+    """
+    # Notion verilerini ID'ye göre mapla
+    notion_map = {item.get('notion_id', ''): item for item in notion_data if item.get('notion_id', '')}
+    
+    actions = []
+    for idx, sheet_row in enumerate(sheets_data):
+        notion_id = sheet_row.get('notion_id', '')
         
+        if notion_id and notion_id in notion_map:
+            # Mevcut Notion sayfası - değişiklik varsa güncelle
+            if sheet_row_needs_update(sheet_row, notion_map[notion_id]):
+                actions.append(('update', idx, notion_id, build_notion_properties(sheet_row)))
+        elif not notion_id and sheet_row.get('Etkinlik Adı'):
+            # Notion ID yok ama Etkinlik Adı var - Sheets'te manuel olarak eklenmiş yeni kayıt
+            actions.append(('create', idx, '', build_notion_properties(sheet_row)))
+    
+    return actions
+
+def record_created_page(sheet_ops, idx, new_notion_id):
+    """Notion'da oluşturulan sayfanın notion_id'sini Sheets satırına geri aktarır"""
+    print(f"Yeni kayıt oluşturuldu: {new_notion_id}")
+    
+    if 'notion_id' in sheet_ops.headers and new_notion_id:
+        # Sayfa Notion'da oluştu, notion_id kaybolursa bir sonraki çalışmada tekrar
+        # oluşturulur - bu yüzden sıraya alınmadan hemen yazılır
+        values = {'notion_id': new_notion_id}
+        if 'last_edited_time' in sheet_ops.headers:
+            values['last_edited_time'] = datetime.now().isoformat()
+        sheet_ops.write_now(idx, values)
+        print(f"Yeni notion_id Google Sheets'e aktarıldı: {new_notion_id}")
+
+def plan_deleted_records(notion_data, sheets_data, scope):
+    """Bir sistemde silinmiş kayıtları belirler.
+    
+    (Sheets'ten silinecek notion_id'ler, Notion'dan silinecek notion_id'ler) döndürür.
+    """
+    notion_ids = {item.get('notion_id', '') for item in notion_data if item.get('notion_id', '')}
+    sheets_notion_ids = {row.get('notion_id', '') for row in sheets_data if row.get('notion_id', '')}
+    
+    # Kapsam dışındaki kayıtlar Sheets'e hiç aktarılmaz, bu yüzden Notion'dan
+    # silinecek adaylar sadece kapsam içindeki kayıtlardan seçilir
+    scoped_notion_ids = {item.get('notion_id', '') for item in notion_data
+                         if item.get('notion_id', '') and in_sync_scope(item, scope)}
+    
+    # Notion'da olmayan ama Sheets'te olan kayıtlar Notion'dan, Sheets'te olmayan
+    # ama Notion'da olan kayıtlar Sheets'ten silinmiştir
+    return sheets_notion_ids - notion_ids, scoped_notion_ids - sheets_notion_ids
+
+def sheet_row_needs_update(sheet_row, notion_item):
+    """Sheets satırının Notion sayfasına aktarılması gerekip gerekmediğini belirler"""
+    # Önemli alanları kontrol et
+    for field in ['Etkinlik Adı', 'Müşteri', 'Tarih', 'Yer', 'Durum', 'Etkinlik Türü']:
+        if field in sheet_row and field in notion_item:
+            if str(sheet_row.get(field, '')) != str(notion_item.get(field, '')):
+                print(f"Değişiklik tespit edildi - {field}: '{notion_item.get(field, '')}' -> '{sheet_row.get(field, '')}'")
+                return True
+    
+    # Son düzenleme zamanı kontrolü
+    sheet_last_edited = sheet_row.get('last_edited_time', '')
+    notion_last_edited = notion_item.get('last_edited_time', '')
+    return not sheet_last_edited or not notion_last_edited or sheet_last_edited > notion_last_edited
+
 # Google Sheets verilerinden Notion properties nesnesi oluşturmak için yardımcı fonksiyon
 def build_notion_properties(sheet_row):
     """Google Sheets satırından Notion properties nesnesi oluşturur"""
@@ -641,12 +941,24 @@ def sync_to_notion():
 def sync_both():
     """Notion ve Google Sheets arasında iki yönlü senkronizasyon"""
     try:
-        # Önce Notion'dan Google Sheets'e
-        notion_data = get_notion_data()
-        sheets_result = update_google_sheet(notion_data)
+        sheet_ops = None
+        try:
+            # Önce Notion'dan Google Sheets'e
+            notion_data = get_notion_data(scope=get_sync_scope(), properties=SYNC_PROPERTIES)
+            
+            # Bu çalışmadaki tüm Sheets değişiklikleri sona kadar bellekte toplanır
+            sheet_ops = open_sheet_operations()
+            sheets_result = update_google_sheet(notion_data, sheet_ops)
+            
+            # Sonra Google Sheets'ten Notion'a
+            notion_result = update_notion_from_sheets(sheet_ops)
+        except Exception:
+            # Hata olsa bile o ana kadar yapılanlar kaybolmasın
+            commit_after_error(sheet_ops)
+            raise
         
-        # Sonra Google Sheets'ten Notion'a
-        notion_result = update_notion_from_sheets()
+        # Net değişiklikleri tek seferde yaz
+        sheet_ops.commit()
         
         return jsonify({
             "status": "success",
@@ -666,22 +978,34 @@ def sync_optimized():
         last_sync = get_last_sync_time()
         print(f"Son senkronizasyon: {last_sync}")
         
-        # 1. Notion'dan değişen verileri al
-        notion_data = get_notion_data(filter_recent=True) if last_sync else get_notion_data()
-        print(f"Notion'dan {len(notion_data)} kayıt alındı")
-        
-        # 2. Sheets'ten değişen verileri al
-        sheets_data = get_sheets_data()
-        print(f"Sheets'ten {len(sheets_data)} kayıt alındı")
-        
-        # 3. Notion'daki değişiklikleri Sheets'e aktar
-        sheets_result = update_google_sheet(notion_data)
-        
-        # 4. Sheets'teki değişiklikleri Notion'a aktar
-        notion_result = update_notion_from_sheets()
+        sheet_ops = None
+        try:
+            # 1. Notion'dan değişen verileri al
+            notion_data = get_notion_data(filter_recent=bool(last_sync), scope=get_sync_scope(), properties=SYNC_PROPERTIES)
+            print(f"Notion'dan {len(notion_data)} kayıt alındı")
+            
+            # Bu çalışmadaki tüm Sheets değişiklikleri sona kadar bellekte toplanır
+            sheet_ops = open_sheet_operations()
+            
+            # 2. Sheets'ten değişen verileri al
+            sheets_data = get_sheets_data(sheet_ops)
+            print(f"Sheets'ten {len(sheets_data)} kayıt alındı")
+            
+            # 3. Notion'daki değişiklikleri Sheets'e aktar
+            sheets_result = update_google_sheet(notion_data, sheet_ops)
+            
+            # 4. Sheets'teki değişiklikleri Notion'a aktar
+            notion_result = update_notion_from_sheets(sheet_ops)
+            
+            # 5. Silinen kayıtları işle
+            deleted_result = handle_deleted_records(sheet_ops)
+        except Exception:
+            # Hata olsa bile o ana kadar yapılanlar kaybolmasın
+            commit_after_error(sheet_ops)
+            raise
         
-        # 5. Silinen kayıtları işle
-        deleted_result = handle_deleted_records()
+        # Net değişiklikleri tek seferde yaz
+        sheet_ops.commit()
         
         # 6. Son senkronizasyon zamanını güncelle
         new_sync_time = save_last_sync_time()
@@ -0,0 +1,358 @@
+import asyncio
+
+import httpx
+from quart import Quart, request, jsonify
+
+from app import (
+    NOTION_DATABASE_ID,
+    NOTION_HEADERS,
+    NOTION_PROPERTY_IDS,
+    SCOPE_PROPERTIES,
+    SYNC_PROPERTIES,
+    build_create_page_payload,
+    build_notion_query,
+    commit_after_error,
+    delete_from_sheets,
+    get_last_sync_time,
+    get_sync_scope,
+    lookup_notion_property_ids,
+    open_sheet_operations,
+    parse_notion_results,
+    plan_deleted_records,
+    plan_notion_changes,
+    record_created_page,
+    save_last_sync_time,
+    store_notion_property_ids,
+    update_google_sheet,
+)
+
+# ASGI sunucusu ile çalıştırmak için: hypercorn asgi:app --bind 0.0.0.0:$PORT
+# Notion istekleri httpx ile asenkron yapılır, gspread çağrıları iş parçacığında çalışır.
+# Senkronizasyon kararları app.py ile ortaktır, burada sadece I/O beklenir.
+app = Quart(__name__)
+
+# Tüm istekler tarafından paylaşılan Notion istemcisi
+notion_client = None
+
+# Sheets okuma-değiştirme-yazma adımları birbirinin değişikliklerini ezmesin diye sıraya alınır
+SHEET_LOCK = None
+
+# Webhook ile tetiklenen senkronizasyonlar - bir senkronizasyon çalışırken gelen
+# olaylar tek bir sonraki çalışmada birleştirilir
+webhook_sync_pending = False
+webhook_sync_running = False
+
+@app.before_serving
+async def startup():
+    global notion_client, SHEET_LOCK
+    notion_client = httpx.AsyncClient(headers=NOTION_HEADERS, timeout=60.0)
+    SHEET_LOCK = asyncio.Lock()
+
+@app.after_serving
+async def shutdown():
+    await notion_client.aclose()
+
+async def get_notion_property_ids(names):
+    """Notion özellik adlarını özellik ID'lerine çevirir (önbellek senkron uygulama ile ortaktır)"""
+    if not NOTION_PROPERTY_IDS:
+        url = f"https://api.notion.com/v1/databases/{NOTION_DATABASE_ID}"
+        response = await notion_client.get(url)
+        
+        if response.status_code != 200:
+            raise Exception(f"Notion şema hatası: {response.status_code} - {response.text}")
+        
+        store_notion_property_ids(response.json())
+    
+    return lookup_notion_property_ids(names)
+
+async def get_notion_data(filter_recent=False, scope=None, properties=None):
+    """Notion veritabanından asenkron olarak veri çeker"""
+    property_ids = await get_notion_property_ids(properties) if properties else []
+    url, payload = build_notion_query(filter_recent, scope, property_ids)
+    
+    # Notion her istekte en fazla 100 kayıt döndürür, tüm sayfaları dolaş
+    results = []
+    while True:
+        response = await notion_client.post(url, json=payload)
+        
+        if response.status_code != 200:
+            raise Exception(f"Notion API hatası: {response.status_code} - {response.text}")
+        
+        data = response.json()
+        results.extend(parse_notion_results(data))
+        
+        if not data.get('has_more') or not data.get('next_cursor'):
+            return results
+        payload["start_cursor"] = data['next_cursor']
+
+async def update_notion_page(page_id, properties):
+    """Notion'da bir sayfayı günceller"""
+    url = f"https://api.notion.com/v1/pages/{page_id}"
+    
+    response = await notion_client.patch(url, json={"properties": properties})
+    
+    if response.status_code != 200:
+        raise Exception(f"Notion sayfa güncelleme hatası: {response.status_code} - {response.text}")
+    
+    return response.json()
+
+async def create_notion_page(properties):
+    """Notion'da yeni bir sayfa oluşturur"""
+    url = "https://api.notion.com/v1/pages"
+    
+    response = await notion_client.post(url, json=build_create_page_payload(properties))
+    
+    if response.status_code != 200:
+        raise Exception(f"Notion sayfa oluşturma hatası: {response.status_code} - {response.text}")
+    
+    return response.json()
+
+async def delete_from_notion(notion_id):
+    """Notion'dan bir sayfayı siler (arşivler)"""
+    try:
+        url = f"https://api.notion.com/v1/pages/{notion_id}"
+        
+        response = await notion_client.patch(url, json={"archived": True})
+        
+        if response.status_code != 200:
+            print(f"Notion silme hatası: {response.status_code} - {response.text}")
+            return False
+        
+        print(f"Notion'dan silindi (arşivlendi): {notion_id}")
+        return True
+    except Exception as e:
+        print(f"Notion'dan silme hatası: {str(e)}")
+        return False
+
+async def update_notion_from_sheets(sheet_ops, notion_data):
+    """Google Sheets'ten Notion'a veri aktarır (Notion verileri önceden alınmış olmalı)"""
+    try:
+        sheets_data = sheet_ops.get_all_records()
+        print(f"Google Sheets'ten {len(sheets_data)} kayıt alındı.")
+        
+        updated_count = 0
+        new_count = 0
+        
+        for action, idx, notion_id, properties in plan_notion_changes(sheets_data, notion_data):
+            if action == 'update':
+                await update_notion_page(notion_id, properties)
+                updated_count += 1
+                print(f"Kayıt güncellendi: {notion_id}")
+            else:
+                response = await create_notion_page(properties)
+                new_count += 1
+                await asyncio.to_thread(record_created_page, sheet_ops, idx, response.get('id', ''))
+        
+        return {"updated": updated_count, "new": new_count, "total": len(sheets_data)}
+    except Exception as e:
+        print(f"Notion güncelleme hatası: {str(e)}")
+        raise Exception(f"Notion güncelleme hatası: {str(e)}")
+
+async def handle_deleted_records(sheet_ops):
+    """Bir sistemde silinen kayıtları diğer sistemde de siler.
+    
+    Notion kayıtları burada, bu çalışmada oluşturulan sayfalardan ve kilit beklenirken
+    başka çalışmaların yaptığı değişikliklerden sonra okunur; eski bir okuma yeni
+    satırların silinmesine yol açar.
+    """
+    try:
+        notion_data = await get_notion_data(properties=SCOPE_PROPERTIES)
+        deleted_from_notion, deleted_from_sheets = plan_deleted_records(
+            notion_data, sheet_ops.get_all_records(), get_sync_scope())
+        
+        # Notion'dan silinmiş kayıtları Sheets'ten sil
+        notion_deleted_count = 0
+        for notion_id in deleted_from_notion:
+            if delete_from_sheets(notion_id, sheet_ops):
+                notion_deleted_count += 1
+        
+        # Sheets'ten silinmiş kayıtları Notion'dan sil
+        sheets_deleted_count = 0
+        for notion_id in deleted_from_sheets:
+            if await delete_from_notion(notion_id):
+                sheets_deleted_count += 1
+        
+        return {"notion": notion_deleted_count, "sheets": sheets_deleted_count}
+    except Exception as e:
+        print(f"Silinen kayıtları işleme hatası: {str(e)}")
+        return {"notion": 0, "sheets": 0}
+
+async def run_sheet_changes(apply):
+    """Sheets'i okur, apply(sheet_ops) ile değişiklikleri sıraya alır ve tek seferde yazar.
+    
+    Kilit sadece bu okuma-değiştirme-yazma süresince tutulur; senkronizasyon için
+    Notion okumaları çağırmadan önce yapılmalıdır (silme kontrolü hariç).
+    """
+    async with SHEET_LOCK:
+        sheet_ops = None
+        try:
+            sheet_ops = await asyncio.to_thread(open_sheet_operations)
+            result = await apply(sheet_ops)
+        except Exception:
+            # Hata olsa bile o ana kadar yapılanlar kaybolmasın
+            await asyncio.to_thread(commit_after_error, sheet_ops)
+            raise
+        
+        await asyncio.to_thread(sheet_ops.commit)
+        return result
+
+async def sync_to_sheets():
+    """Notion'dan Google Sheets'e tek yönlü senkronizasyon"""
+    notion_data = await get_notion_data(scope=get_sync_scope(), properties=SYNC_PROPERTIES)
+    
+    async def apply(sheet_ops):
+        return update_google_sheet(notion_data, sheet_ops)
+    
+    await run_sheet_changes(apply)
+    return notion_data
+
+async def run_webhook_syncs():
+    """Bekleyen webhook senkronizasyonlarını arka planda, birleştirerek çalıştırır"""
+    global webhook_sync_pending, webhook_sync_running
+    try:
+        while webhook_sync_pending:
+            webhook_sync_pending = False
+            try:
+                notion_data = await sync_to_sheets()
+                print(f"Webhook senkronizasyonu: {len(notion_data)} kayıt işlendi")
+            except Exception as e:
+                print(f"Webhook senkronizasyon hatası: {str(e)}")
+    finally:
+        webhook_sync_running = False
+
+@app.route('/')
+async def home():
+    return "Notion-Sheets Senkronizasyon Servisi Aktif"
+
+@app.route('/webhook', methods=['POST'])
+async def webhook():
+    global webhook_sync_pending, webhook_sync_running
+    data = await request.get_json() or {}
+    print("Webhook verisi:", data)
+    
+    # Webhook doğrulama
+    if 'challenge' in data:
+        return jsonify({"challenge": data['challenge']})
+    
+    # Olayı hemen onayla, senkronizasyonu arka planda yap
+    webhook_sync_pending = True
+    if not webhook_sync_running:
+        webhook_sync_running = True
+        app.add_background_task(run_webhook_syncs)
+    
+    return jsonify({
+        "status": "success",
+        "message": "Senkronizasyon sıraya alındı"
+    })
+
+@app.route('/sync', methods=['GET'])
+async def manual_sync():
+    """Manuel senkronizasyon için endpoint"""
+    try:
+        notion_data = await sync_to_sheets()
+        
+        return jsonify({
+            "status": "success",
+            "message": f"{len(notion_data)} kayıt başarıyla Google Sheets'e aktarıldı."
+        })
+    except Exception as e:
+        error_detail = str(e)
+        print(f"Sync hatası: {error_detail}")
+        return jsonify({"status": "error", "message": error_detail}), 500
+
+@app.route('/test-notion', methods=['GET'])
+async def test_notion():
+    """Notion bağlantısını test et"""
+    try:
+        notion_data = await get_notion_data()
+        return jsonify({
+            "status": "success",
+            "record_count": len(notion_data),
+            "data": notion_data[:2]  # Sadece ilk 2 kaydı göster
+        })
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/sync-to-notion', methods=['GET'])
+async def sync_to_notion():
+    """Google Sheets'ten Notion'a manuel senkronizasyon"""
+    try:
+        notion_data = await get_notion_data(scope=get_sync_scope(), properties=SYNC_PROPERTIES)
+        
+        async def apply(sheet_ops):
+            return await update_notion_from_sheets(sheet_ops, notion_data)
+        
+        result = await run_sheet_changes(apply)
+        
+        return jsonify({
+            "status": "success",
+            "message": f"{result['total']} kayıt işlendi. {result['new']} yeni, {result['updated']} güncellendi."
+        })
+    except Exception as e:
+        error_detail = str(e)
+        print(f"Senkronizasyon hatası: {error_detail}")
+        return jsonify({"status": "error", "message": error_detail}), 500
+
+@app.route('/sync-both', methods=['GET'])
+async def sync_both():
+    """Notion ve Google Sheets arasında iki yönlü senkronizasyon"""
+    try:
+        notion_data = await get_notion_data(scope=get_sync_scope(), properties=SYNC_PROPERTIES)
+        
+        async def apply(sheet_ops):
+            # Önce Notion'dan Google Sheets'e, sonra Google Sheets'ten Notion'a
+            sheets_result = update_google_sheet(notion_data, sheet_ops)
+            notion_result = await update_notion_from_sheets(sheet_ops, notion_data)
+            return sheets_result, notion_result
+        
+        sheets_result, notion_result = await run_sheet_changes(apply)
+        
+        return jsonify({
+            "status": "success",
+            "sheets_sync": f"{sheets_result['total']} kayıt işlendi. {sheets_result['new']} yeni, {sheets_result['updated']} güncellendi.",
+            "notion_sync": f"{notion_result['total']} kayıt işlendi. {notion_result['new']} yeni, {notion_result['updated']} güncellendi."
+        })
+    except Exception as e:
+        error_detail = str(e)
+        print(f"İki yönlü senkronizasyon hatası: {error_detail}")
+        return jsonify({"status": "error", "message": error_detail}), 500
+
+@app.route('/sync-optimized', methods=['GET'])
+async def sync_optimized():
+    """Optimize edilmiş iki yönlü senkronizasyon"""
+    try:
+        last_sync = get_last_sync_time()
+        print(f"Son senkronizasyon: {last_sync}")
+        
+        # Senkronizasyon için Notion okumaları kilit dışında ve paralel yapılır
+        scope = get_sync_scope()
+        queries = [get_notion_data(scope=scope, properties=SYNC_PROPERTIES)]
+        if last_sync:
+            queries.append(get_notion_data(filter_recent=True, scope=scope, properties=SYNC_PROPERTIES))
+        results = await asyncio.gather(*queries)
+        scoped_data = results[0]
+        notion_data = results[-1]
+        print(f"Notion'dan {len(notion_data)} kayıt alındı")
+        
+        async def apply(sheet_ops):
+            sheets_result = update_google_sheet(notion_data, sheet_ops)
+            notion_result = await update_notion_from_sheets(sheet_ops, scoped_data)
+            deleted_result = await handle_deleted_records(sheet_ops)
+            return sheets_result, notion_result, deleted_result
+        
+        sheets_result, notion_result, deleted_result = await run_sheet_changes(apply)
+        
+        new_sync_time = save_last_sync_time()
+        
+        return jsonify({
+            "status": "success",
+            "last_sync": last_sync,
+            "new_sync": new_sync_time,
+            "sheets_sync": f"{sheets_result['total']} kayıt işlendi. {sheets_result['new']} yeni, {sheets_result['updated']} güncellendi.",
+            "notion_sync": f"{notion_result['total']} kayıt işlendi. {notion_result['new']} yeni, {notion_result['updated']} güncellendi.",
+            "deleted": f"{deleted_result['notion']} kayıt Notion'dan, {deleted_result['sheets']} kayıt Sheets'ten silindi."
+        })
+    except Exception as e:
+        error_detail = str(e)
+        print(f"Senkronizasyon hatası: {error_detail}")
+        return jsonify({"status": "error", "message": error_detail}), 500
@@ -0,0 +1,186 @@
+import pytest
+from gspread.utils import a1_to_rowcol
+
+from app import SheetOperations, plan_deleted_records, plan_notion_changes
+
+
+HEADERS = ['Etkinlik Adı', 'Tarih', 'notion_id', 'last_edited_time']
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.requests = []
+
+    def batch_update(self, body):
+        self.requests.append(body)
+        for req in body['requests']:
+            if 'deleteDimension' in req:
+                rng = req['deleteDimension']['range']
+                del self.worksheet.values[rng['startIndex']:rng['endIndex']]
+                self.worksheet.row_count -= rng['endIndex'] - rng['startIndex']
+            elif 'appendDimension' in req:
+                self.worksheet.row_count += req['appendDimension']['length']
+
+
+class FakeWorksheet:
+    """Sheets API'sini bellekte taklit eder, istekleri tabloya uygular"""
+
+    id = 0
+
+    def __init__(self, values, row_count=None):
+        self.values = [list(row) for row in values]
+        self.row_count = row_count if row_count is not None else max(len(values), 1)
+        self.spreadsheet = FakeSpreadsheet(self)
+        self.value_updates = []
+
+    def get_all_values(self):
+        return [list(row) for row in self.values if any(row)]
+
+    def batch_update(self, data):
+        self.value_updates.append(data)
+        for item in data:
+            start, end = item['range'].split(':') if ':' in item['range'] else (item['range'], item['range'])
+            row, col = a1_to_rowcol(start)
+            assert row <= self.row_count, "aralık tablo dışında"
+            while len(self.values) < row:
+                self.values.append([])
+            target = self.values[row - 1]
+            for offset, value in enumerate(item['values'][0]):
+                target += [''] * (col + offset - len(target))
+                target[col + offset - 1] = value
+
+
+def make_sheet(*rows, row_count=None):
+    return FakeWorksheet([HEADERS] + [list(row) for row in rows], row_count=row_count)
+
+
+def test_update_sort_delete_same_row():
+    sheet = make_sheet(['b', '2024-01-02', '1', 't1'], ['a', '2024-01-01', '2', 't1'], ['c', '2024-01-03', '3', 't1'])
+    ops = SheetOperations(sheet)
+
+    ops.update_row(2, {'Etkinlik Adı': 'C', 'Tarih': '2024-02-03', 'notion_id': '3', 'last_edited_time': 't2'})
+    ops.update_cell(2, 'last_edited_time', 't3')
+    ops.sort_rows('Etkinlik Adı')
+    ops.delete_row(ops.find_row('3'))
+    ops.commit()
+
+    assert sheet.get_all_values() == [HEADERS, ['a', '2024-01-01', '2', 't1'], ['b', '2024-01-02', '1', 't1']]
+    # Silinen satıra yapılan yazmalar hiç gönderilmez
+    written = [value for data in sheet.value_updates for item in data for value in item['values'][0]]
+    assert 'C' not in written and 't3' not in written
+
+
+def test_appended_then_deleted_row_sends_nothing():
+    sheet = make_sheet(['a', '', '1', 't1'])
+    ops = SheetOperations(sheet)
+
+    ops.append_row({'Etkinlik Adı': 'x', 'notion_id': '9'})
+    ops.delete_row(ops.find_row('9'))
+
+    assert ops.commit() == 0
+    assert sheet.spreadsheet.requests == []
+    assert sheet.value_updates == []
+
+
+def test_growing_past_row_count():
+    sheet = make_sheet(['a', '', '1', 't1'], row_count=2)
+    ops = SheetOperations(sheet)
+
+    ops.append_row({'Etkinlik Adı': 'b', 'notion_id': '2'})
+    ops.append_row({'Etkinlik Adı': 'c', 'notion_id': '3'})
+    ops.commit()
+
+    assert sheet.spreadsheet.requests == [{'requests': [{'appendDimension': {
+        'sheetId': 0, 'dimension': 'ROWS', 'length': 2}}]}]
+    assert [row[2] for row in sheet.get_all_values()[1:]] == ['1', '2', '3']
+
+
+def test_layout_change_aborts_commit():
+    sheet = make_sheet(['a', '', '1', 't1'], ['b', '', '2', 't1'])
+    ops = SheetOperations(sheet)
+    ops.delete_row(ops.find_row('1'))
+
+    # Kullanıcı bu arada satırları sıraladı
+    sheet.values[1], sheet.values[2] = sheet.values[2], sheet.values[1]
+
+    with pytest.raises(Exception):
+        ops.commit()
+    assert sheet.spreadsheet.requests == []
+    assert sheet.value_updates == []
+
+
+def test_rows_appended_during_run_are_kept():
+    sheet = make_sheet(['b', '', '2', 't1'], ['a', '', '1', 't1'], row_count=10)
+    ops = SheetOperations(sheet)
+    ops.append_row({'Etkinlik Adı': 'c', 'notion_id': '3'})
+    ops.sort_rows('Etkinlik Adı')
+
+    # Kullanıcı bu arada sona bir satır ekledi
+    sheet.values.append(['user', '', '', ''])
+
+    ops.commit()
+
+    assert [row[0] for row in sheet.get_all_values()[1:]] == ['a', 'b', 'c', 'user']
+
+
+def test_write_now_survives_aborted_commit():
+    sheet = make_sheet(['a', '', '1', 't1'], ['new', '', '', ''], row_count=10)
+    ops = SheetOperations(sheet)
+
+    # Kullanıcı sayfanın başına satır ekledi - okunan satırlar kaydı
+    sheet.values.insert(1, ['inserted', '', '', ''])
+    ops.write_now(1, {'notion_id': 'created'})
+    ops.update_cell(0, 'last_edited_time', 't2')
+
+    assert sheet.get_all_values()[3] == ['new', '', 'created', '']
+    with pytest.raises(Exception):
+        ops.commit()
+    assert sheet.get_all_values()[3] == ['new', '', 'created', '']
+
+
+def test_write_now_is_not_rewritten_by_commit():
+    sheet = make_sheet(['new', '', '', ''])
+    ops = SheetOperations(sheet)
+
+    ops.write_now(0, {'notion_id': 'created', 'last_edited_time': 't1'})
+    sheet.value_updates.clear()
+
+    assert ops.commit() == 0
+    assert sheet.value_updates == []
+
+
+def test_plan_notion_changes():
+    sheets_data = [
+        {'Etkinlik Adı': 'a', 'notion_id': '1', 'last_edited_time': '2024-01-02'},
+        {'Etkinlik Adı': 'b', 'notion_id': '2', 'last_edited_time': '2024-01-01'},
+        {'Etkinlik Adı': 'yeni', 'notion_id': '', 'last_edited_time': ''},
+        {'Etkinlik Adı': '', 'notion_id': '', 'last_edited_time': ''},
+        {'Etkinlik Adı': 'c', 'notion_id': 'kapsam-dışı', 'last_edited_time': ''},
+    ]
+    notion_data = [
+        {'Etkinlik Adı': 'a', 'notion_id': '1', 'last_edited_time': '2024-01-01'},
+        {'Etkinlik Adı': 'b', 'notion_id': '2', 'last_edited_time': '2024-01-02'},
+    ]
+
+    actions = plan_notion_changes(sheets_data, notion_data)
+
+    assert [action[:3] for action in actions] == [('update', 0, '1'), ('create', 2, '')]
+    assert actions[1][3]['Etkinlik Adı'] == {"title": [{"text": {"content": 'yeni'}}]}
+
+
+def test_plan_deleted_records_respects_scope():
+    notion_data = [
+        {'notion_id': '1', 'Tarih': '2024-06-01', 'Durum': 'Onaylandı'},
+        {'notion_id': '2', 'Tarih': '2024-06-01', 'Durum': 'Onaylandı'},
+        {'notion_id': '3', 'Tarih': '2023-01-01', 'Durum': 'Onaylandı'},
+        {'notion_id': '4', 'Tarih': '2024-06-01', 'Durum': 'İptal'},
+    ]
+    sheets_data = [{'notion_id': '1'}, {'notion_id': '9'}, {'notion_id': ''}]
+    scope = {'date_from': '2024-01-01', 'date_to': '', 'status': ['Onaylandı']}
+
+    deleted_from_notion, deleted_from_sheets = plan_deleted_records(notion_data, sheets_data, scope)
+
+    assert deleted_from_notion == {'9'}
+    # Kapsam dışındaki 3 ve 4 Sheets'te olmasa da Notion'dan silinmez
+    assert deleted_from_sheets == {'2'}